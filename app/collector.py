@@ -1,20 +1,141 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
 
-from sqlmodel import Session, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlmodel import select
 from telethon import TelegramClient
 
 from telemetry_config import settings
 from .db import engine
 from .models import TelemetryPacket
-from .parser import parse_tinygs_telegram
+from .parser import Parsed, parse_tinygs_telegram
+from .rawtext import compress_raw_text
+
+
+# сколько строк копим перед одним bulk INSERT, и как часто сбрасываем неполную пачку
+INSERT_BATCH_SIZE = 500
+INSERT_FLUSH_SEC = 1.0
+INSERT_QUEUE_SIZE = 512
+
+# размер страницы сообщений (макс. для одного GetHistoryRequest) и глубина очереди страниц
+FETCH_PAGE_SIZE = 100
+FETCH_QUEUE_PAGES = 4
+
+# (message_id, ts_utc, text)
+_Msg = Tuple[int, datetime, str]
 
 
 def utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def _insert_stmt(dialect_name: str):
+    """
+    Core INSERT (без ORM-инструментации на каждую строку). На Postgres/SQLite дубли
+    (channel, message_id) отбрасывает сама БД — важно при параллельных запусках коллектора.
+    """
+    table = TelemetryPacket.__table__
+    if dialect_name == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect_name == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return table.insert()
+
+
+def _existing_message_ids(conn: Connection, since: datetime) -> set[int]:
+    return set(
+        conn.execute(
+            select(TelemetryPacket.message_id).where(
+                TelemetryPacket.channel == settings.tg_channel,
+                TelemetryPacket.ts_utc >= since,
+            )
+        ).scalars().all()
+    )
+
+
+def _parse_batch(texts: List[str]) -> List[Optional[Parsed]]:
+    return [parse_tinygs_telegram(t) for t in texts]
+
+
+async def _fetch_pages(
+    client: TelegramClient,
+    entity,
+    since: datetime,
+    queue: "asyncio.Queue[Optional[List[_Msg]]]",
+) -> None:
+    """
+    Producer: читает историю канала (новые -> старые) до `since`
+    и кладёт страницы по FETCH_PAGE_SIZE сообщений в очередь. None = конец.
+    """
+    try:
+        page: List[_Msg] = []
+        async for msg in client.iter_messages(entity, limit=None):
+            if not msg.date:
+                continue
+            msg_ts = msg.date.replace(tzinfo=timezone.utc)
+            if msg_ts < since:
+                break
+
+            page.append((msg.id, msg_ts, msg.message or ""))
+            if len(page) >= FETCH_PAGE_SIZE:
+                await queue.put(page)
+                page = []
+
+        if page:
+            await queue.put(page)
+    except Exception:
+        # consumer ещё читает очередь: будим его, ошибку поднимет `await producer`
+        await queue.put(None)
+        raise
+    await queue.put(None)
+
+
+async def _write_rows(
+    conn: Connection, insert_q: "asyncio.Queue[Optional[dict]]", failed: asyncio.Event
+) -> None:
+    """
+    Writer: копит строки из очереди и пишет их bulk INSERT'ом (каждые INSERT_BATCH_SIZE
+    строк или INSERT_FLUSH_SEC секунд) в executor'е, не блокируя чтение Telegram. None = конец.
+    При ошибке выставляет `failed` — consumer перестаёт читать историю.
+    """
+    loop = asyncio.get_running_loop()
+    stmt = _insert_stmt(conn.dialect.name)
+    batch: list[dict] = []
+
+    async def flush() -> None:
+        nonlocal batch
+        rows, batch = batch, []
+        await loop.run_in_executor(None, conn.execute, stmt, rows)
+
+    try:
+        while True:
+            try:
+                row = await asyncio.wait_for(insert_q.get(), timeout=INSERT_FLUSH_SEC)
+            except asyncio.TimeoutError:
+                if batch:
+                    await flush()
+                continue
+
+            if row is None:
+                break
+            batch.append(row)
+            if len(batch) >= INSERT_BATCH_SIZE:
+                await flush()
+
+        if batch:
+            await flush()
+    except Exception:
+        failed.set()
+        # освобождаем очередь: consumer, ждущий в put(), проснётся и увидит failed
+        while not insert_q.empty():
+            insert_q.get_nowait()
+        raise
+
+
 async def collect_last_month(satellite: str = "Polytech_Universe-3", days: int = 30) -> int:
     if not settings.tg_api_id or not settings.tg_api_hash:
         raise RuntimeError("Set TG_API_ID and TG_API_HASH in .env")
@@ -25,56 +146,96 @@ async def collect_last_month(satellite: str = "Polytech_Universe-3", days: int =
         entity = await client.get_entity(settings.tg_channel)
 
         inserted = 0
-        with Session(engine) as session:
-            async for msg in client.iter_messages(entity):
-                if not msg.date:
-                    continue
-                msg_ts = msg.date.replace(tzinfo=timezone.utc)
-                if msg_ts < since:
-                    break
-
-                text = msg.message or ""
-                if satellite not in text:
-                    continue
-
-                # дедуп по message_id
-                exists = session.exec(
-                    select(TelemetryPacket).where(
-                        TelemetryPacket.channel == settings.tg_channel,
-                        TelemetryPacket.message_id == msg.id,
+        loop = asyncio.get_running_loop()
+
+        # коллектор работает в event loop'е API: checkout соединения, запросы и commit — в executor'е.
+        # Одна транзакция на весь сбор; close() без commit = rollback.
+        conn = await loop.run_in_executor(None, engine.connect)
+        try:
+            trans = conn.begin()
+
+            # дедуп по message_id: один запрос на весь интервал вместо SELECT на каждое сообщение
+            # (экономит парсинг/сжатие уже известных сообщений; окончательно дубли режет БД)
+            existing_ids = await loop.run_in_executor(None, _existing_message_ids, conn, since)
+
+            # сеть (MTProto) — в producer-задаче, запись в БД — в writer-задаче, парсинг — здесь
+            queue: asyncio.Queue[Optional[List[_Msg]]] = asyncio.Queue(maxsize=FETCH_QUEUE_PAGES)
+            insert_q: asyncio.Queue[Optional[dict]] = asyncio.Queue(maxsize=INSERT_QUEUE_SIZE)
+            writer_failed = asyncio.Event()
+            writer_stopping = False
+            producer = asyncio.create_task(_fetch_pages(client, entity, since, queue))
+            writer = asyncio.create_task(_write_rows(conn, insert_q, writer_failed))
+
+            try:
+                while not writer_failed.is_set():
+                    page = await queue.get()
+                    if page is None:
+                        break
+
+                    candidates = [
+                        (mid, ts, text)
+                        for mid, ts, text in page
+                        if satellite in text and mid not in existing_ids
+                    ]
+                    if not candidates:
+                        continue
+
+                    parsed_batch = await loop.run_in_executor(
+                        None, _parse_batch, [text for _mid, _ts, text in candidates]
                     )
-                ).first()
-                if exists:
-                    continue
-
-                parsed = parse_tinygs_telegram(text)
-                if not parsed:
-                    continue
-
-                row = TelemetryPacket(
-                    channel=settings.tg_channel,
-                    message_id=msg.id,
-                    satellite=parsed.satellite,
-                    ts_utc=msg_ts,
-                    raw_text=text,
-                    tle_lat=parsed.tle_lat,
-                    tle_lon=parsed.tle_lon,
-                    temp_c=parsed.temp_c,
-                    temp_min_c=parsed.temp_min_c,
-                    temp_max_c=parsed.temp_max_c,
-                    vbus_mv=parsed.vbus_mv,
-                    ibus_ma=parsed.ibus_ma,
-                    battery_capacity_pct=parsed.battery_capacity_pct,
-                    solar_voltage_mv=parsed.solar_voltage_mv,
-                    solar_total_mw=parsed.solar_total_mw,
-                    rssi_dbm=parsed.rssi_dbm,
-                    snr_db=parsed.snr_db,
-                    uptime_sec=parsed.uptime_sec,
-                    reset_count=parsed.reset_count,
-                )
-                session.add(row)
-                inserted += 1
-
-            session.commit()
-
-        return inserted
\ No newline at end of file
+
+                    for (mid, msg_ts, text), parsed in zip(candidates, parsed_batch):
+                        if not parsed:
+                            continue
+
+                        await insert_q.put(
+                            dict(
+                                channel=settings.tg_channel,
+                                message_id=mid,
+                                satellite=parsed.satellite,
+                                ts_utc=msg_ts,
+                                raw_text="",
+                                raw_text_z=compress_raw_text(text),
+                                tle_lat=parsed.tle_lat,
+                                tle_lon=parsed.tle_lon,
+                                temp_c=parsed.temp_c,
+                                temp_min_c=parsed.temp_min_c,
+                                temp_max_c=parsed.temp_max_c,
+                                vbus_mv=parsed.vbus_mv,
+                                ibus_ma=parsed.ibus_ma,
+                                battery_capacity_pct=parsed.battery_capacity_pct,
+                                solar_voltage_mv=parsed.solar_voltage_mv,
+                                solar_total_mw=parsed.solar_total_mw,
+                                rssi_dbm=parsed.rssi_dbm,
+                                snr_db=parsed.snr_db,
+                                uptime_sec=parsed.uptime_sec,
+                                reset_count=parsed.reset_count,
+                            )
+                        )
+                        existing_ids.add(mid)
+                        inserted += 1
+                        if writer_failed.is_set():
+                            break
+
+                if not writer_failed.is_set():
+                    # пробрасываем ошибку чтения истории, если была
+                    await producer
+
+                    await insert_q.put(None)
+                    writer_stopping = True
+                # пробрасываем ошибку записи в БД, если была
+                await writer
+            finally:
+                producer.cancel()
+                if not writer.done() and not writer_stopping:
+                    # writer останавливаем sentinel'ом, а не cancel(): на 3.11 wait_for может
+                    # проглотить отмену, и writer продолжил бы писать в закрытое соединение
+                    await insert_q.put(None)
+                # соединение закрываем только после того, как обе задачи завершились
+                await asyncio.gather(producer, writer, return_exceptions=True)
+
+            await loop.run_in_executor(None, trans.commit)
+        finally:
+            await loop.run_in_executor(None, conn.close)
+
+        return inserted
@@ -1,11 +1,32 @@
+import logging
+
 from sqlmodel import SQLModel, Session, create_engine
 from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from telemetry_config import settings
 
+logger = logging.getLogger(__name__)
+
+_engine_kwargs = {}
+if not settings.database_url.startswith("sqlite"):
+    # один общий пул на процесс; pre-ping отсеивает "протухшие" соединения
+    _engine_kwargs.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
+if settings.database_url.startswith(("postgresql://", "postgresql+psycopg2://")):
+    # psycopg2 fast execution helpers: executemany -> multi-VALUES batches
+    _engine_kwargs["executemany_mode"] = "values_plus_batch"
+
 engine = create_engine(
     settings.database_url,
     echo=False,
+    # кэш скомпилированных SQL (по умолчанию 500) — хватает на все формы запросов API
+    query_cache_size=1200,
     connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {},
+    **_engine_kwargs,
 )
 
 def init_db():
@@ -24,6 +45,7 @@ def init_db():
 
             add_col("battery_capacity_pct", "battery_capacity_pct REAL")
             add_col("solar_voltage_mv", "solar_voltage_mv INTEGER")
+            add_col("raw_text_z", "raw_text_z BLOB")
 
         else:
             # Postgres / others: check columns via information_schema
@@ -40,7 +62,22 @@ def init_db():
 
             add_col("battery_capacity_pct", "battery_capacity_pct DOUBLE PRECISION")
             add_col("solar_voltage_mv", "solar_voltage_mv INTEGER")
+            add_col("raw_text_z", "raw_text_z BYTEA")
+
+        # create_all не трогает индексы уже существующих таблиц
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tp_sat_ts ON telemetrypacket (satellite, ts_utc)"))
+
+    # отдельной транзакцией: на старых данных с дублями уникальный индекс не создастся,
+    # но это не должно ронять старт приложения
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_tp_channel_msgid ON telemetrypacket (channel, message_id)"
+            ))
+    except IntegrityError as e:
+        logger.warning("cannot create unique index ix_tp_channel_msgid (duplicate rows?): %s", e)
 
 def get_session():
-    with Session(engine) as session:
+    # ручки API только читают: autoflush и expire после commit не нужны
+    with Session(engine, autoflush=False, expire_on_commit=False) as session:
         yield session
\ No newline at end of file
@@ -1,28 +1,45 @@
 from __future__ import annotations
 
+import csv
+import io
 from datetime import datetime, timezone, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Iterator
 
 from fastapi import FastAPI, Depends, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlmodel import Session, select
 
-from sgp4.api import Satrec, jday
+from sgp4.api import Satrec
 import math
+import numpy as np
+
+try:  # опционально: JIT для скалярного пути ecef_to_geodetic
+    from numba import njit
+except ImportError:  # без numba — тот же код, просто интерпретируемый
+    def njit(*_args, **_kwargs):
+        return lambda fn: fn
 
 from telemetry_config import settings
-from .db import init_db, get_session
+from .db import engine, init_db, get_session
 from .models import TelemetryPacket
 from .collect_api import router as collect_router
+from .cache import TTLCache
+from .rawtext import raw_text_of
+
 
+app = FastAPI(title="Telemetry Aggregator (TinyGS Telegram)", default_response_class=ORJSONResponse)
 
-app = FastAPI(title="Telemetry Aggregator (TinyGS Telegram)")
+# frozenset: CORSMiddleware проверяет `origin in allow_origins` на каждый запрос — O(1) вместо O(n)
+_CORS_ORIGINS = (
+    frozenset(o.strip() for o in settings.cors_allow_origins.split(",") if o.strip())
+    if settings.cors_allow_origins != "*"
+    else frozenset({"*"})
+)
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[o.strip() for o in settings.cors_allow_origins.split(",")]
-    if settings.cors_allow_origins != "*"
-    else ["*"],
+    allow_origins=_CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -45,43 +62,50 @@ WGS84_A = 6378.137  # km
 WGS84_F = 1.0 / 298.257223563
 WGS84_E2 = WGS84_F * (2 - WGS84_F)
 
+# Julian date of the Unix epoch (1970-01-01T00:00:00Z) and of J2000
+JD_UNIX_EPOCH = 2440587.5
+JD_J2000 = 2451545.0
 
-def gmst_rad(dt_utc: datetime) -> float:
-    jd, fr = jday(
-        dt_utc.year, dt_utc.month, dt_utc.day,
-        dt_utc.hour, dt_utc.minute,
-        dt_utc.second + dt_utc.microsecond / 1e6
-    )
-    JD = jd + fr
-    T = (JD - 2451545.0) / 36525.0
-
-    gmst_sec = (
-        67310.54841 +
-        (876600.0 * 3600 + 8640184.812866) * T +
-        0.093104 * T * T -
-        6.2e-6 * T * T * T
-    )
-    gmst_sec = gmst_sec % 86400.0
+# GMST (sec) = G0 + G1*T + G2*T^2 + G3*T^3, T in Julian centuries from J2000 (evaluated via Horner)
+GMST_G0 = 67310.54841
+GMST_G1 = 876600.0 * 3600 + 8640184.812866
+GMST_G2 = 0.093104
+GMST_G3 = -6.2e-6
+
+
+def gmst_rad(jd: np.ndarray, fr: np.ndarray) -> np.ndarray:
+    """GMST (rad) for arrays of Julian dates split as jd + fr (any split, as accepted by sgp4)."""
+    T = ((jd - JD_J2000) + fr) / 36525.0
+
+    gmst_sec = ((GMST_G3 * T + GMST_G2) * T + GMST_G1) * T + GMST_G0
+    gmst_sec = np.mod(gmst_sec, 86400.0)
     return (gmst_sec / 86400.0) * (2.0 * math.pi)
 
 
-def teme_to_ecef(r_teme_km: List[float], dt_utc: datetime) -> List[float]:
-    gmst = gmst_rad(dt_utc)
-    x, y, z = r_teme_km
-    cosg = math.cos(gmst)
-    sing = math.sin(gmst)
+def teme_to_ecef(r_teme_km: np.ndarray, gmst: np.ndarray) -> np.ndarray:
+    """Rotate (N, 3) TEME positions about Z by GMST; returns (N, 3) ECEF."""
+    x = r_teme_km[:, 0]
+    y = r_teme_km[:, 1]
+    cosg = np.cos(gmst)
+    sing = np.sin(gmst)
 
-    x_ecef = cosg * x + sing * y
-    y_ecef = -sing * x + cosg * y
-    z_ecef = z
-    return [x_ecef, y_ecef, z_ecef]
+    r_ecef = np.empty_like(r_teme_km)
+    r_ecef[:, 0] = cosg * x + sing * y
+    r_ecef[:, 1] = -sing * x + cosg * y
+    r_ecef[:, 2] = r_teme_km[:, 2]
+    return r_ecef
 
 
-def ecef_to_geodetic(r_ecef_km: List[float]) -> (float, float):
-    x, y, z = r_ecef_km
+# до скольких точек считаем поточечно: на маленьких N накладные расходы NumPy дороже самой математики
+GEODETIC_SCALAR_MAX_N = 16
+
+
+@njit(cache=True, fastmath=True)
+def _geodetic_scalar(x: float, y: float, z: float) -> Tuple[float, float]:
+    """Single ECEF point (km) -> (lat_rad, lon_rad); same 5-step fixpoint as the array path."""
     lon = math.atan2(y, x)
 
-    p = math.sqrt(x * x + y * y)
+    p = math.hypot(x, y)
     lat = math.atan2(z, p * (1 - WGS84_E2))
 
     for _ in range(5):
@@ -89,10 +113,36 @@ def ecef_to_geodetic(r_ecef_km: List[float]) -> (float, float):
         N = WGS84_A / math.sqrt(1 - WGS84_E2 * sin_lat * sin_lat)
         lat = math.atan2(z + WGS84_E2 * N * sin_lat, p)
 
-    return math.degrees(lat), math.degrees(lon)
+    return lat, lon
+
 
+def ecef_to_geodetic(r_ecef_km: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(N, 3) ECEF -> (lat_deg, lon_deg); the fixpoint runs 5 times over the whole array."""
+    n = r_ecef_km.shape[0]
+    if n <= GEODETIC_SCALAR_MAX_N:
+        lat = np.empty(n)
+        lon = np.empty(n)
+        for i, (x, y, z) in enumerate(r_ecef_km.tolist()):
+            lat[i], lon[i] = _geodetic_scalar(x, y, z)
+        return np.degrees(lat), np.degrees(lon)
 
-def normalize_lon_deg(lon: float) -> float:
+    x = r_ecef_km[:, 0]
+    y = r_ecef_km[:, 1]
+    z = r_ecef_km[:, 2]
+    lon = np.arctan2(y, x)
+
+    p = np.hypot(x, y)
+    lat = np.arctan2(z, p * (1 - WGS84_E2))
+
+    for _ in range(5):
+        sin_lat = np.sin(lat)
+        N = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat * sin_lat)
+        lat = np.arctan2(z + WGS84_E2 * N * sin_lat, p)
+
+    return np.degrees(lat), np.degrees(lon)
+
+
+def normalize_lon_deg(lon):
     return (lon + 180.0) % 360.0 - 180.0
 
 
@@ -120,13 +170,108 @@ def get_telemetry(
         q = q.where(TelemetryPacket.ts_utc <= to_ts)
 
     q = q.order_by(TelemetryPacket.ts_utc).limit(limit)
-    return session.exec(q).all()
+    rows = session.exec(q).all()
+
+    # отдаём готовый ORJSONResponse: минуем jsonable_encoder, datetime кодирует orjson
+    out = []
+    for r in rows:
+        d = r.model_dump(exclude={"raw_text_z"})
+        d["raw_text"] = raw_text_of(r.raw_text, r.raw_text_z)
+        out.append(d)
+    return ORJSONResponse(out)
+
+
+# DISTINCT + сортировка на стороне БД (по индексу ix_tp_sat_ts)
+_SAT_DISTINCT_STMT = (
+    select(TelemetryPacket.satellite).distinct().order_by(TelemetryPacket.satellite)
+)
+
+# список спутников почти не меняется: держим его в памяти процесса 30 секунд
+_SATELLITES_CACHE = TTLCache(maxsize=1, ttl=30)
 
 
 @app.get("/api/satellites")
 def list_satellites(session: Session = Depends(get_session)):
-    rows = session.exec(select(TelemetryPacket.satellite).distinct()).all()
-    return sorted(set(rows))
+    rows = _SATELLITES_CACHE.get("all")
+    if rows is None:
+        rows = session.exec(_SAT_DISTINCT_STMT).all()
+        _SATELLITES_CACHE.set("all", rows)
+    return rows
+
+
+# колонки /api/telemetry/series (порядок = порядок колонок CSV/Arrow)
+SERIES_FIELDS = (
+    "ts_utc",
+    "temp_c",
+    "battery_capacity_pct",
+    "vbus_mv",
+    "solar_voltage_mv",
+    "ibus_ma",
+    "solar_total_mw",
+    "rssi_dbm",
+    "snr_db",
+    "uptime_sec",
+    "reset_count",
+)
+SERIES_COLUMNS = tuple(getattr(TelemetryPacket, f) for f in SERIES_FIELDS)
+SERIES_CHUNK_ROWS = 10000
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def _iter_series_chunks(q) -> Iterator[List[List[Any]]]:
+    """
+    Построчно читает серию из БД порциями по SERIES_CHUNK_ROWS (yield_per).
+    Своя сессия: yield-зависимость get_session закрывается до отправки StreamingResponse.
+    """
+    with Session(engine, autoflush=False) as session:
+        chunk: List[List[Any]] = []
+        for r in session.exec(q.execution_options(yield_per=SERIES_CHUNK_ROWS)):
+            chunk.append(list(r))
+            if len(chunk) >= SERIES_CHUNK_ROWS:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _stream_series_csv(q) -> Iterator[str]:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(SERIES_FIELDS)
+    yield buf.getvalue()
+
+    for chunk in _iter_series_chunks(q):
+        buf.seek(0)
+        buf.truncate()
+        for row in chunk:
+            ts = row[0]
+            row[0] = ts.isoformat() if ts is not None else None
+            w.writerow(row)
+        yield buf.getvalue()
+
+
+def _stream_series_arrow(q, pa) -> Iterator[bytes]:
+    schema = pa.schema(
+        [("ts_utc", pa.timestamp("us", tz="UTC"))]
+        + [(f, pa.float64()) for f in ("temp_c", "battery_capacity_pct")]
+        + [(f, pa.int64()) for f in SERIES_FIELDS[3:]]
+    )
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for chunk in _iter_series_chunks(q):
+            columns = list(zip(*chunk))
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+
+    # end-of-stream marker пишется при закрытии writer
+    yield sink.getvalue()
 
 
 @app.get("/api/telemetry/series")
@@ -134,9 +279,11 @@ def get_series(
     sat: str = Query("Polytech_Universe-3"),
     from_ts: Optional[datetime] = Query(None, alias="from"),
     to_ts: Optional[datetime] = Query(None, alias="to"),
+    format: str = Query("json", pattern="^(json|csv|arrow)$", description="json | csv | arrow (IPC stream)"),
     session: Session = Depends(get_session),
 ):
-    q = select(TelemetryPacket).where(TelemetryPacket.satellite == sat)
+    # только нужные колонки: без raw_text (самая тяжёлая колонка)
+    q = select(*SERIES_COLUMNS).where(TelemetryPacket.satellite == sat)
 
     if from_ts:
         if from_ts.tzinfo is None:
@@ -149,29 +296,62 @@ def get_series(
         q = q.where(TelemetryPacket.ts_utc <= to_ts)
 
     q = q.order_by(TelemetryPacket.ts_utc)
+
+    # потоковые форматы: память O(chunk) вместо O(N), без JSON-кодирования
+    if format == "csv":
+        return StreamingResponse(_stream_series_csv(q), media_type="text/csv")
+
+    if format == "arrow":
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise HTTPException(status_code=400, detail="format=arrow requires pyarrow on the server")
+        return StreamingResponse(_stream_series_arrow(q, pa), media_type=ARROW_STREAM_MEDIA_TYPE)
+
     rows = session.exec(q).all()
 
-    return [
-        {
-            "ts_utc": r.ts_utc,
-            "temp_c": r.temp_c,
-            "battery_capacity_pct": getattr(r, "battery_capacity_pct", None),
-            "vbus_mv": r.vbus_mv,
-            "solar_voltage_mv": getattr(r, "solar_voltage_mv", None),
-            "ibus_ma": r.ibus_ma,
-            "solar_total_mw": r.solar_total_mw,
-            "rssi_dbm": r.rssi_dbm,
-            "snr_db": r.snr_db,
-            "uptime_sec": r.uptime_sec,
-            "reset_count": r.reset_count,
-        }
-        for r in rows
-    ]
+    return ORJSONResponse([dict(zip(SERIES_FIELDS, r)) for r in rows])
 
 
 # ----------------------------
 # Orbit track endpoint (TLE + SGP4)
 # ----------------------------
+# (sat, base rounded to minute, minutes, step_sec) -> (start, offsets_sec, lat_deg, lon_deg)
+# Опрос дашборда в пределах одной минуты = одна пропагация SGP4.
+# В кэше только массивы: словари точек собираются на каждый ответ.
+_ORBIT_TRACK_CACHE = TTLCache(maxsize=256, ttl=60)
+
+
+def _propagate(
+    satrec: Satrec, t0: float, offsets_sec: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Positions at unix time t0 + offsets_sec -> (ok mask, lat_deg, lon_deg) for the ok points."""
+    # JD = JD_UNIX_EPOCH + days since epoch: без jday() и календарной арифметики
+    jd_arr = np.full(len(offsets_sec), JD_UNIX_EPOCH)
+    fr_arr = (t0 + offsets_sec) / 86400.0
+
+    e_arr, r_arr, _v_arr = satrec.sgp4_array(jd_arr, fr_arr)
+
+    ok = e_arr == 0
+    gmst = gmst_rad(jd_arr[ok], fr_arr[ok])
+    r_ecef = teme_to_ecef(r_arr[ok], gmst)
+    lat_arr, lon_arr = ecef_to_geodetic(r_ecef)
+    return ok, lat_arr, normalize_lon_deg(lon_arr)
+
+
+def _compute_track(
+    satrec: Satrec, base: datetime, minutes: int, step_sec: int
+) -> Tuple[datetime, np.ndarray, np.ndarray, np.ndarray]:
+    start = base - timedelta(minutes=minutes / 2)
+
+    # все моменты окна пропагируются одним вызовом SGP4 (C-цикл вместо Python-цикла)
+    n = int(minutes * 60 // step_sec) + 1
+    offsets_sec = np.arange(n, dtype=np.float64) * step_sec
+
+    ok, lat_arr, lon_arr = _propagate(satrec, start.timestamp(), offsets_sec)
+    return start, offsets_sec[ok], lat_arr, lon_arr
+
+
 @app.get("/api/orbit/track")
 def orbit_track(
     sat: str = Query("Polytech_Universe-3", description="Satellite name exactly as in your DB"),
@@ -193,36 +373,25 @@ def orbit_track(
 
     satrec = Satrec.twoline2rv(tle1, tle2)
 
-    start = base - timedelta(minutes=minutes / 2)
-    end = base + timedelta(minutes=minutes / 2)
+    # трек — по сетке от base, округлённого до минуты (кэшируется)
+    base_minute = base.replace(second=0, microsecond=0)
+    key = (sat, base_minute.isoformat(), minutes, step_sec)
+    cached = _ORBIT_TRACK_CACHE.get(key)
+    if cached is None:
+        cached = _compute_track(satrec, base_minute, minutes, step_sec)
+        _ORBIT_TRACK_CACHE.set(key, cached)
+    start, offsets_sec, lat_arr, lon_arr = cached
+
+    track = [
+        {"ts_utc": (start + timedelta(seconds=off)).isoformat(), "lat": lat, "lon": lon}
+        for off, lat, lon in zip(offsets_sec.tolist(), lat_arr.tolist(), lon_arr.tolist())
+    ]
 
-    track = []
+    # текущая позиция — точно в момент base, отдельным вызовом SGP4 вне кэша
     current = None
-
-    t = start
-    while t <= end:
-        jd, fr = jday(
-            t.year, t.month, t.day,
-            t.hour, t.minute,
-            t.second + t.microsecond / 1e6
-        )
-        e, r_teme, _v = satrec.sgp4(jd, fr)
-        if e == 0:
-            r_ecef = teme_to_ecef(r_teme, t)
-            lat, lon = ecef_to_geodetic(r_ecef)
-            lon = normalize_lon_deg(lon)
-
-            p = {"ts_utc": t.isoformat(), "lat": lat, "lon": lon}
-            track.append(p)
-
-            if current is None:
-                current = p
-            else:
-                ct = datetime.fromisoformat(current["ts_utc"])
-                if abs((t - base).total_seconds()) < abs((ct - base).total_seconds()):
-                    current = p
-
-        t += timedelta(seconds=step_sec)
+    ok, cur_lat, cur_lon = _propagate(satrec, base.timestamp(), np.zeros(1))
+    if ok[0]:
+        current = {"ts_utc": base.isoformat(), "lat": float(cur_lat[0]), "lon": float(cur_lon[0])}
 
     return {
         "sat": sat,
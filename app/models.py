@@ -3,10 +3,18 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 
 class TelemetryPacket(SQLModel, table=True):
+    __table_args__ = (
+        # канонический запрос API: WHERE satellite = ? ORDER BY / диапазон по ts_utc
+        Index("ix_tp_sat_ts", "satellite", "ts_utc"),
+        # дедуп коллектора по (channel, message_id)
+        Index("ix_tp_channel_msgid", "channel", "message_id", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     channel: str = Field(index=True)
@@ -16,8 +24,10 @@ class TelemetryPacket(SQLModel, table=True):
     # время сообщения (UTC) из Telegram
     ts_utc: datetime = Field(index=True)
 
-    # сырой текст сообщения (чтобы можно было перепарсить позже)
+    # сырой текст сообщения (чтобы можно было перепарсить позже).
+    # Новые строки хранят его сжатым в raw_text_z (см. app/rawtext.py), а raw_text = "".
     raw_text: str
+    raw_text_z: Optional[bytes] = None
 
     # основные “поля” под графики (nullable)
     tle_lat: Optional[float] = None
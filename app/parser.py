@@ -32,97 +32,106 @@ class Parsed:
 
 
 SAT_RE = re.compile(r"^🛰\s*(?P<sat>.+)\s*$", re.MULTILINE)
-TLE_LOC_RE = re.compile(r"TLE Location:\s*\[(?P<lat>%s)\s*,\s*(?P<lon>%s)\]" % (_float, _float))
-TEMP_RE = re.compile(r"🌡\s*(?P<t>%s)\s*ºC" % _float)
-TEMP_MIN_RE = re.compile(r"min\s*(?P<t>%s)\s*ºC" % _float)
-TEMP_MAX_RE = re.compile(r"max\s*(?P<t>%s)\s*ºC" % _float)
-
-# варианты: "🔋 7950mV Vbus 7950mV Ibus 55mA" или "Vbus 8426mV Ibus 138mA"
-VBUS_RE = re.compile(r"(?:🔋\s*)?(?:\d+\s*mV\s*)?Vbus\s*(?P<v>\d+)\s*mV", re.IGNORECASE)
-IBUS_RE = re.compile(r"Ibus\s*(?P<i>[-+]?\d+)\s*mA", re.IGNORECASE)
-
-# суммарная мощность: "☀️🧮 2049mW"
-SOLAR_TOTAL_RE = re.compile(r"☀️🧮\s*(?P<p>\d+)\s*mW")
-
-# Battery capacity: e.g. "Battery Capacity 47%", "Batt 47%", "🔋 47%"
-BATTERY_CAP_RE = re.compile(
-    r"(?:Battery\s*Capacity|Battery\s*Cap|Batt(?:ery)?\s*(?:Capacity|Cap)?|🔋)\s*:?\s*(?P<pct>%s)\s*%%" % _float,
-    re.IGNORECASE,
-)
 
-# Solar voltage: e.g. "Solar Voltage 25000mV", "Vsolar 25000mV", "☀️ V 25000mV"
-SOLAR_VOLT_RE = re.compile(
-    r"(?:Solar\s*Voltage|Solar\s*V|Vsolar|Vsol|☀️\s*V)\s*:?\s*(?P<v>\d+)\s*mV",
-    re.IGNORECASE,
+# Все поля телеметрии сканируются ОДНИМ проходом по тексту: каждое поле — именованная
+# ветка общего alternation (имя ветки -> список (атрибут Parsed, cast)).
+# Имена групп со значениями совпадают с атрибутами Parsed.
+_FIELDS = {
+    "tle_loc": (
+        r"TLE Location:\s*\[(?P<tle_lat>%s)\s*,\s*(?P<tle_lon>%s)\]" % (_float, _float),
+        (("tle_lat", float), ("tle_lon", float)),
+    ),
+    "temp": (
+        r"🌡\s*(?P<temp_c>%s)\s*ºC" % _float,
+        (("temp_c", float),),
+    ),
+    "temp_min": (
+        r"min\s*(?P<temp_min_c>%s)\s*ºC" % _float,
+        (("temp_min_c", float),),
+    ),
+    "temp_max": (
+        r"max\s*(?P<temp_max_c>%s)\s*ºC" % _float,
+        (("temp_max_c", float),),
+    ),
+    # варианты: "🔋 7950mV Vbus 7950mV Ibus 55mA" или "Vbus 8426mV Ibus 138mA"
+    "vbus": (
+        r"(?i:(?:🔋\s*)?(?:\d+\s*mV\s*)?Vbus\s*(?P<vbus_mv>\d+)\s*mV)",
+        (("vbus_mv", int),),
+    ),
+    "ibus": (
+        r"(?i:Ibus\s*(?P<ibus_ma>[-+]?\d+)\s*mA)",
+        (("ibus_ma", int),),
+    ),
+    # Battery capacity: e.g. "Battery Capacity 47%", "Batt 47%", "🔋 47%"
+    "battery_cap": (
+        r"(?i:(?:Battery\s*Capacity|Battery\s*Cap|Batt(?:ery)?\s*(?:Capacity|Cap)?|🔋)\s*:?\s*(?P<battery_capacity_pct>%s)\s*%%)"
+        % _float,
+        (("battery_capacity_pct", float),),
+    ),
+    # Solar voltage: e.g. "Solar Voltage 25000mV", "Vsolar 25000mV", "☀️ V 25000mV"
+    "solar_volt": (
+        r"(?i:(?:Solar\s*Voltage|Solar\s*V|Vsolar|Vsol|☀️\s*V)\s*:?\s*(?P<solar_voltage_mv>\d+)\s*mV)",
+        (("solar_voltage_mv", int),),
+    ),
+    # суммарная мощность: "☀️🧮 2049mW"
+    "solar_total": (
+        r"☀️🧮\s*(?P<solar_total_mw>\d+)\s*mW",
+        (("solar_total_mw", int),),
+    ),
+    # "📞📶 RSSI: -83dBm SNR:0dB"
+    "rssi": (
+        r"(?i:RSSI:\s*(?P<rssi_dbm>-?\d+)\s*dBm)",
+        (("rssi_dbm", int),),
+    ),
+    "snr": (
+        r"(?i:SNR:\s*(?P<snr_db>-?\d+)\s*dB)",
+        (("snr_db", int),),
+    ),
+    "uptime": (
+        r"(?i:Uptime:\s*(?P<uptime_sec>\d+)\s*sec)",
+        (("uptime_sec", int),),
+    ),
+    "reset": (
+        r"(?i:Reset:\s*(?P<reset_count>\d+))",
+        (("reset_count", int),),
+    ),
+}
+
+# Lookahead по первым символам веток: без него sre пробует все ветки на каждой позиции
+# и единый проход выходит медленнее отдельных search(). Vbus может начинаться с цифры
+# ("7950mV Vbus 7950mV"), но то же значение находится и с позиции "Vbus".
+_FIRST_CHARS = r"(?i:(?=[tmvibsru🌡🔋☀]))"
+
+PARSER_RE = re.compile(
+    _FIRST_CHARS + "(?:" + "|".join(f"(?P<{k}>{pat})" for k, (pat, _) in _FIELDS.items()) + ")"
 )
-
-# "📞📶 RSSI: -83dBm SNR:0dB"
-RSSI_RE = re.compile(r"RSSI:\s*(?P<r>-?\d+)\s*dBm", re.IGNORECASE)
-SNR_RE = re.compile(r"SNR:\s*(?P<s>-?\d+)\s*dB", re.IGNORECASE)
-
-UPTIME_RE = re.compile(r"Uptime:\s*(?P<u>\d+)\s*sec", re.IGNORECASE)
-RESET_RE = re.compile(r"Reset:\s*(?P<rc>\d+)", re.IGNORECASE)
+_FIELD_VALUES = {k: values for k, (_, values) in _FIELDS.items()}
 
 
 def parse_tinygs_telegram(text: str) -> Optional[Parsed]:
-    m = SAT_RE.search(text)
-    if not m:
+    # дешёвый C-level поиск подстроки до MULTILINE-регекса: чужие сообщения отсекаются сразу
+    i = text.find("🛰")
+    if i == -1:
         return None
-    sat = m.group("sat").strip()
-
-    out = Parsed(satellite=sat)
-
-    m = TLE_LOC_RE.search(text)
-    if m:
-        out.tle_lat = float(m.group("lat"))
-        out.tle_lon = float(m.group("lon"))
-
-    m = TEMP_RE.search(text)
-    if m:
-        out.temp_c = float(m.group("t"))
-
-    m = TEMP_MIN_RE.search(text)
-    if m:
-        out.temp_min_c = float(m.group("t"))
 
-    m = TEMP_MAX_RE.search(text)
-    if m:
-        out.temp_max_c = float(m.group("t"))
+    # типичный заголовок "🛰 <sat>" в начале строки разбираем срезом, без SAT_RE;
+    # прочие случаи (🛰 не в начале строки, имя на следующей строке) — как раньше, регексом
+    sat = ""
+    if i == 0 or text[i - 1] == "\n":
+        nl = text.find("\n", i)
+        sat = text[i + 1 : nl if nl != -1 else len(text)].strip()
+    if not sat:
+        m = SAT_RE.search(text)
+        if not m:
+            return None
+        sat = m.group("sat").strip()
 
-    m = VBUS_RE.search(text)
-    if m:
-        out.vbus_mv = int(m.group("v"))
-
-    m = IBUS_RE.search(text)
-    if m:
-        out.ibus_ma = int(m.group("i"))
-
-    m = BATTERY_CAP_RE.search(text)
-    if m:
-        out.battery_capacity_pct = float(m.group("pct"))
-
-    m = SOLAR_VOLT_RE.search(text)
-    if m:
-        out.solar_voltage_mv = int(m.group("v"))
-
-    m = SOLAR_TOTAL_RE.search(text)
-    if m:
-        out.solar_total_mw = int(m.group("p"))
-
-    m = RSSI_RE.search(text)
-    if m:
-        out.rssi_dbm = int(m.group("r"))
-
-    m = SNR_RE.search(text)
-    if m:
-        out.snr_db = int(m.group("s"))
-
-    m = UPTIME_RE.search(text)
-    if m:
-        out.uptime_sec = int(m.group("u"))
+    out = Parsed(satellite=sat)
 
-    m = RESET_RE.search(text)
-    if m:
-        out.reset_count = int(m.group("rc"))
+    # как и раньше, берём первое вхождение каждого поля
+    for m in PARSER_RE.finditer(text):
+        for attr, cast in _FIELD_VALUES[m.lastgroup]:
+            if getattr(out, attr) is None:
+                setattr(out, attr, cast(m.group(attr)))
 
-    return out
\ No newline at end of file
+    return out
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import zlib
+from typing import Optional
+
+# Сжатие сырого текста TinyGS-сообщений: zlib с preset-словарём (zdict).
+# Сообщения почти целиком состоят из одинаковых эмодзи-заголовков и подписей полей,
+# поэтому словарь из одного типичного сообщения даёт ~3.5x против ~1.4x у zlib без словаря.
+#
+# ВАЖНО: словарь нельзя менять для уже записанных данных — новый словарь = новая версия.
+_ZDICT_V1 = (
+    "🛰 Polytech_Universe-3\n"
+    "🗺 TLE Location: [3.392,-27.366]\n"
+    "LoRa 436.55Mhz  SF8 CR6  BW: 62.5kHz\n"
+    "\n"
+    "📻 800mW\n"
+    "🔋 8050mV Vbus 8050mV Ibus 57mA 🔋 50%\n"
+    "🔋1️⃣ 8050mV 287mA 4658mAh\n"
+    "🔋2️⃣ 6000mV -5mA 0mAh\n"
+    "🌡29ºC  🔋🌡min 9ºC  🔋🌡max 10ºC  \n"
+    "\n"
+    "☀️1️⃣ 0mW 19V 0mA\n"
+    "☀️2️⃣ 1372mW 21V 65mA\n"
+    "☀️3️⃣ 4625mW 19V 250mA\n"
+    "☀️🧮 5997mW\n"
+    "\n"
+    "📞📶 RSSI: -88dBm SNR:0dB  21368sec ago\n"
+    "⏳Uptime: 23796sec 🔄Reset: 2\n"
+    "\n"
+    "Received by (1):\n"
+    " 📡 PT7AT (1603 km)"
+).encode("utf-8")
+
+# первый байт blob'а = версия словаря
+_V1 = b"\x01"
+_ZDICTS = {_V1: _ZDICT_V1}
+
+
+def compress_raw_text(text: str) -> bytes:
+    c = zlib.compressobj(level=9, zdict=_ZDICT_V1)
+    return _V1 + c.compress(text.encode("utf-8")) + c.flush()
+
+
+def decompress_raw_text(blob: bytes) -> str:
+    d = zlib.decompressobj(zdict=_ZDICTS[blob[:1]])
+    return (d.decompress(blob[1:]) + d.flush()).decode("utf-8")
+
+
+def raw_text_of(raw_text: Optional[str], raw_text_z: Optional[bytes]) -> str:
+    """Текст сообщения: старые строки хранят его в raw_text, новые — сжатым в raw_text_z."""
+    if raw_text_z:
+        return decompress_raw_text(raw_text_z)
+    return raw_text or ""
@@ -4,7 +4,7 @@ import re
 import logging
 from datetime import datetime
 
-from telegram_handler import collect_links_with_flags, get_channel_info
+from telegram_handler import close_clients, collect_links_with_flags, get_channel_info
 from utils import log_info
 
 
@@ -31,6 +31,29 @@ def sanitize_filename(name: str) -> str:
     return re.sub(r"[\\/*?:\"<>|]", "_", name)
 
 
+async def _run(channel_name: str, search_term: str, max_records: int):
+    """Steps 1-2 in one event loop, so both share a single Telegram connection."""
+    try:
+        # Step 1: Get channel info
+        log_info(f"Fetching channel info for: {channel_name}")
+        channel_info = await get_channel_info(channel_name)
+        if not channel_info:
+            return None, None
+
+        # Step 2: Collect links using flags (start/middle/end)
+        log_info(f"Collecting telemetry links from: {channel_name} for: {search_term} (max={max_records})")
+        records = await collect_links_with_flags(
+            channel_name=channel_name,
+            search_term=search_term,
+            max_records=max_records,
+            reconnect_delay_sec=2.0,
+            session_name="session_name",
+        )
+        return channel_info, records
+    finally:
+        await close_clients()
+
+
 if __name__ == "__main__":
     _configure_quiet_logging()
 
@@ -42,9 +65,7 @@ if __name__ == "__main__":
     SEARCH_TERM = "Polytech_Universe-5"
     MAX_RECORDS = 10  # how many new telemetry records to collect per manual run
 
-    # Step 1: Get channel info
-    log_info(f"Fetching channel info for: {CHANNEL_NAME}")
-    channel_info = asyncio.run(get_channel_info(CHANNEL_NAME))
+    channel_info, records = asyncio.run(_run(CHANNEL_NAME, SEARCH_TERM, MAX_RECORDS))
     if not channel_info:
         log_info("Channel not found or access denied. Exiting.")
         raise SystemExit(1)
@@ -52,19 +73,6 @@ if __name__ == "__main__":
     # Print only minimal info (no big entity object)
     print(f"Channel info: name={channel_info.get('name')} id={channel_info.get('id')}")
 
-    # Step 2: Collect links using flags (start/middle/end) and automatic reconnect
-    log_info(f"Collecting telemetry links from: {CHANNEL_NAME} for: {SEARCH_TERM} (max={MAX_RECORDS})")
-    records = asyncio.run(
-        collect_links_with_flags(
-            channel_name=CHANNEL_NAME,
-            search_term=SEARCH_TERM,
-            max_records=MAX_RECORDS,
-            batch_size=99,
-            reconnect_delay_sec=2.0,
-            session_name="session_name",
-        )
-    )
-
     log_info(f"Collected {len(records)} records.")
 
     # Step 3: Save daily txt/json snapshot (compatible with existing parse.py)
@@ -1,12 +1,24 @@
-import json
 import os
+import time
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
+import orjson
+
+
+# _now_iso() has second resolution: format once per second, reuse the string in between
+_last_now_s = -1
+_last_now_iso = ""
+
 
 def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+    global _last_now_s, _last_now_iso
+    now_s = int(time.time())
+    if now_s != _last_now_s:
+        _last_now_iso = datetime.fromtimestamp(now_s, timezone.utc).isoformat(timespec="seconds")
+        _last_now_s = now_s
+    return _last_now_iso
 
 
 @dataclass
@@ -28,7 +40,10 @@ class MsgFlag:
 
 
 class StateStore:
-    """JSON state file used as a 'text flags file' (start/middle/end flags)."""
+    """JSON state file used as a 'text flags file' (start/middle/end flags).
+
+    Read-only: loaded once, to import it into the SQLite state DB (state_sqlite.py).
+    """
 
     def __init__(self, path: str):
         self.path = path
@@ -45,16 +60,8 @@ class StateStore:
                 "end_flag": None,
                 "last_run": None,
             }
-        with open(self.path, "r", encoding="utf-8") as f:
-            return json.load(f)
-
-    def save(self, state: Dict[str, Any]) -> None:
-        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
-        state["updated_at"] = _now_iso()
-        tmp_path = self.path + ".tmp"
-        with open(tmp_path, "w", encoding="utf-8") as f:
-            json.dump(state, f, ensure_ascii=False, indent=2)
-        os.replace(tmp_path, self.path)
+        with open(self.path, "rb") as f:
+            return orjson.loads(f.read())
 
 
 def make_state_path(state_dir: str, channel_name: str, search_term: str) -> str:
@@ -0,0 +1,188 @@
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+from state_manager import StateStore, _now_iso
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    channel TEXT NOT NULL,
+    term TEXT NOT NULL,
+    start_id INTEGER,
+    start_date TEXT,
+    middle_id INTEGER,
+    middle_date TEXT,
+    end_id INTEGER,
+    end_date TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT,
+    updated_at TEXT,
+    meta TEXT,
+    recent_ids TEXT,
+    PRIMARY KEY (channel, term)
+)
+"""
+
+# records collected by the current run of a (channel, term) pair, written in the same
+# transaction as the flags that point past them
+_RECORDS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS collected (
+    channel TEXT NOT NULL,
+    term TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    date TEXT NOT NULL,
+    PRIMARY KEY (channel, term, message_id)
+)
+"""
+
+_UPSERT = """
+INSERT INTO state (
+    channel, term, start_id, start_date, middle_id, middle_date, end_id, end_date,
+    status, created_at, updated_at, meta, recent_ids
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (channel, term) DO UPDATE SET
+    start_id = excluded.start_id,
+    start_date = excluded.start_date,
+    middle_id = excluded.middle_id,
+    middle_date = excluded.middle_date,
+    end_id = excluded.end_id,
+    end_date = excluded.end_date,
+    status = excluded.status,
+    updated_at = excluded.updated_at,
+    meta = excluded.meta,
+    recent_ids = excluded.recent_ids
+"""
+
+_SELECT = """
+SELECT start_id, start_date, middle_id, middle_date, end_id, end_date,
+       status, created_at, updated_at, meta, recent_ids
+FROM state WHERE channel = ? AND term = ?
+"""
+
+_INSERT_RECORD = """
+INSERT OR IGNORE INTO collected (channel, term, message_id, url, date) VALUES (?, ?, ?, ?, ?)
+"""
+
+
+def _flag(flag_id: Optional[int], flag_date: Optional[str]) -> Optional[Dict[str, Any]]:
+    if flag_id is None:
+        return None
+    return {"id": int(flag_id), "date": flag_date}
+
+
+def _flag_cols(flag: Optional[Dict[str, Any]]):
+    if not flag:
+        return None, None
+    return int(flag["id"]), str(flag["date"])
+
+
+class SqliteStateStore:
+    """Start/middle/end flags of all channel+search pairs in one SQLite file.
+
+    Same state dict as StateStore: one row per (channel, term), every save is a
+    single-row UPSERT in WAL mode. save() can also store the records the new flags
+    point past, in the same transaction (table `collected`, one run's worth).
+    An existing flags_*.json (`json_path`) is imported once, on the first load().
+    """
+
+    def __init__(self, db_path: str, channel: str, term: str, json_path: Optional[str] = None):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self.channel = channel
+        self.term = term
+        self.json_path = json_path
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(_SCHEMA)
+            self._conn.execute(_RECORDS_SCHEMA)
+            # CREATE TABLE IF NOT EXISTS does not touch tables from older versions
+            cols = {r[1] for r in self._conn.execute("PRAGMA table_info('state')")}
+            if "recent_ids" not in cols:
+                self._conn.execute("ALTER TABLE state ADD COLUMN recent_ids TEXT")
+
+    def load(self) -> Dict[str, Any]:
+        row = self._conn.execute(_SELECT, (self.channel, self.term)).fetchone()
+        if row is None:
+            if self.json_path and os.path.exists(self.json_path):
+                # one-shot migration from the JSON flags file
+                state = StateStore(self.json_path).load()
+                self.save(state)
+                return state
+            return {
+                "version": 1,
+                "status": "idle",  # idle | in_progress
+                "created_at": _now_iso(),
+                "updated_at": _now_iso(),
+                "start_flag": None,
+                "middle_flag": None,
+                "end_flag": None,
+                "last_run": None,
+            }
+
+        (
+            start_id, start_date, middle_id, middle_date, end_id, end_date,
+            status, created_at, updated_at, meta, recent_ids,
+        ) = row
+        state: Dict[str, Any] = {
+            "version": 1,
+            "status": status,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "start_flag": _flag(start_id, start_date),
+            "middle_flag": _flag(middle_id, middle_date),
+            "end_flag": _flag(end_id, end_date),
+            "last_run": None,
+        }
+        if meta is not None:
+            state["meta"] = orjson.loads(meta)
+        if recent_ids is not None:
+            state["recent_ids"] = orjson.loads(recent_ids)
+        return state
+
+    def save(self, state: Dict[str, Any], records: Iterable[Tuple[str, str, int]] = ()) -> None:
+        """UPSERT the state row; `records` ((url, date, message_id)) go into the same commit."""
+        state["updated_at"] = _now_iso()
+        meta = state.get("meta")
+        recent_ids = state.get("recent_ids")
+        with self._conn:
+            self._conn.executemany(
+                _INSERT_RECORD,
+                ((self.channel, self.term, mid, url, date) for url, date, mid in records),
+            )
+            self._conn.execute(
+                _UPSERT,
+                (
+                    self.channel,
+                    self.term,
+                    *_flag_cols(state.get("start_flag")),
+                    *_flag_cols(state.get("middle_flag")),
+                    *_flag_cols(state.get("end_flag")),
+                    state.get("status", "idle"),
+                    state.get("created_at") or _now_iso(),
+                    state["updated_at"],
+                    orjson.dumps(meta).decode("utf-8") if meta is not None else None,
+                    orjson.dumps(recent_ids).decode("utf-8") if recent_ids is not None else None,
+                ),
+            )
+
+    def load_records(self) -> List[Tuple[str, str, int]]:
+        """Records saved by the current run, in collection order: (url, date, message_id)."""
+        return self._conn.execute(
+            "SELECT url, date, message_id FROM collected WHERE channel = ? AND term = ? ORDER BY rowid",
+            (self.channel, self.term),
+        ).fetchall()
+
+    def clear_records(self) -> None:
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM collected WHERE channel = ? AND term = ?", (self.channel, self.term)
+            )
+
+    def close(self) -> None:
+        self._conn.close()
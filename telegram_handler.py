@@ -1,57 +1,100 @@
 import asyncio
+import logging
 import re
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 from telethon import TelegramClient
+from telethon.tl.types import KeyboardButtonUrl, ReplyInlineMarkup, ReplyKeyboardMarkup
 
-from telemetry_config import API_ID, API_HASH, STATE_DIR
-from state_manager import MsgFlag, StateStore, dict_to_flag, flag_to_dict, make_state_path
+from telemetry_config import API_ID, API_HASH, STATE_DB, STATE_DIR, TG_BATCH_SIZE, TG_SESSION_META
+from state_manager import MsgFlag, dict_to_flag, flag_to_dict, make_state_path
+from state_sqlite import SqliteStateStore
 
 
-# Match first URL-like substring in message text
+logger = logging.getLogger(__name__)
+
+# How many of the latest collected message ids are kept in the state (duplicate guard on resume)
+RECENT_IDS_MAX = 1024
+
+# Match first URL-like substring in message text.
+# NB: no re.ASCII — it would let \S run through U+00A0 and other Unicode spaces.
 _URL_RE = re.compile(r"https?://\S+")
 
+# One connected client per session name, reused by every call within the same event loop
+# (session name -> (loop, client)). Telethon clients cannot move between loops.
+_clients: Dict[str, Tuple[asyncio.AbstractEventLoop, TelegramClient]] = {}
+
+
+async def get_client(session_name: str = "session_name") -> TelegramClient:
+    """Return a connected, authorized client for `session_name`, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    cached = _clients.get(session_name)
+    if cached is not None and cached[0] is loop:
+        client = cached[1]
+    else:
+        client = TelegramClient(session_name, API_ID, API_HASH)
+        _clients[session_name] = (loop, client)
+
+    if not client.is_connected():
+        await client.start()
+    return client
+
+
+async def close_clients() -> None:
+    """Disconnect all clients opened by get_client() in the current event loop."""
+    loop = asyncio.get_running_loop()
+    for name, (client_loop, client) in list(_clients.items()):
+        if client_loop is loop:
+            await client.disconnect()
+            del _clients[name]
+
+
+# The three optional prefixes are stripped in the same order as the former startswith() chain
+_TME_PREFIX_RE = re.compile(r"^(?:https://t\.me/)?(?:http://t\.me/)?(?:t\.me/)?")
+
 
 def _normalize_channel_username(channel_name: str) -> Optional[str]:
     """
     Convert 't.me/xxx' / 'https://t.me/xxx' / '@xxx' into 'xxx'
     so we can build https://t.me/<username>/<message_id> permalinks.
     """
-    s = (channel_name or "").strip()
-    if s.startswith("https://t.me/"):
-        s = s.replace("https://t.me/", "", 1)
-    if s.startswith("http://t.me/"):
-        s = s.replace("http://t.me/", "", 1)
-    if s.startswith("t.me/"):
-        s = s.replace("t.me/", "", 1)
-    s = s.strip("/@ ")
+    s = _TME_PREFIX_RE.sub("", (channel_name or "").strip(), count=1).strip("/@ ")
     return s or None
 
 
-def _extract_url(msg: Any, channel_name: str) -> Optional[str]:
+def _first_button(markup: Any) -> Optional[Any]:
+    """First button of an inline/reply keyboard, or None (no keyboard, empty first row)."""
+    if not isinstance(markup, (ReplyInlineMarkup, ReplyKeyboardMarkup)) or not markup.rows:
+        return None
+    buttons = markup.rows[0].buttons
+    return buttons[0] if buttons else None
+
+
+def _extract_url(msg: Any, username: Optional[str]) -> Optional[str]:
     """
     Extract URL from a message:
-    1) Try inline buttons (msg.buttons)
+    1) Try the first keyboard button (msg.reply_markup)
     2) Try parsing URL from message text
     3) Fallback: build t.me link to the message (public channels)
+
+    `username` is the channel name already passed through _normalize_channel_username.
     """
-    # 1) Buttons
-    try:
-        if getattr(msg, "buttons", None):
-            return msg.buttons[0][0].url
-    except Exception:
-        pass
-
-    # 2) Text URL
-    text = (getattr(msg, "message", None) or "").strip()
-    m = _URL_RE.search(text)
+    # 1) Buttons: raw reply_markup instead of msg.buttons, which wraps every button
+    # in a MessageButton. As before, a non-URL first button gives None, not a fallback.
+    markup = msg.reply_markup
+    if markup is not None:
+        button = _first_button(markup)
+        if button is not None:
+            return button.url if isinstance(button, KeyboardButtonUrl) else None
+
+    # 2) Text URL (no strip(): surrounding whitespace cannot change a \S+ match)
+    m = _URL_RE.search(msg.message or "")
     if m:
         return m.group(0)
 
     # 3) Message permalink (public channel)
-    username = _normalize_channel_username(channel_name)
     if username:
         return f"https://t.me/{username}/{int(msg.id)}"
     return None
@@ -71,15 +114,71 @@ class CollectedRecord:
         }
 
 
-async def get_channel_info(channel_name: str) -> Optional[Dict[str, Any]]:
+class Collected:
+    """Collected links as parallel lists (one append per field instead of an object per match).
+
+    Iterating and indexing yield CollectedRecord (a slice gives a list of them),
+    so callers that expect a list of records keep working.
+    """
+
+    __slots__ = ("urls", "dates", "ids")
+
+    def __init__(self) -> None:
+        self.urls: List[str] = []
+        self.dates: List[str] = []  # ISO strings
+        self.ids: List[int] = []
+
+    def append(self, url: str, date: str, message_id: int) -> None:
+        self.urls.append(url)
+        self.dates.append(date)
+        self.ids.append(message_id)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def to_records(self) -> Iterator[CollectedRecord]:
+        for url, date, message_id in zip(self.urls, self.dates, self.ids):
+            yield CollectedRecord(url=url, date=date, message_id=message_id)
+
+    __iter__ = to_records
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[CollectedRecord, List[CollectedRecord]]:
+        if isinstance(index, slice):
+            return [
+                CollectedRecord(url=url, date=date, message_id=message_id)
+                for url, date, message_id in zip(self.urls[index], self.dates[index], self.ids[index])
+            ]
+        return CollectedRecord(url=self.urls[index], date=self.dates[index], message_id=self.ids[index])
+
+
+# (session name, channel_name) -> resolved channel (entity / input peer), so every call
+# in the process after the first one skips the resolution. Keyed by session: access_hash
+# belongs to the account, an entity resolved by one session may not work in another.
+_entities: Dict[Tuple[str, str], Any] = {}
+
+
+async def _resolve_channel(session_name: str, channel_name: str) -> Any:
+    key = (session_name, channel_name)
+    entity = _entities.get(key)
+    if entity is None:
+        client = await get_client(session_name)
+        # get_input_entity is served from the session's entity cache when possible (no RPC)
+        entity = await client.get_input_entity(channel_name)
+        _entities[key] = entity
+    return entity
+
+
+async def get_channel_info(channel_name: str, session_name: str = "session_name") -> Optional[Dict[str, Any]]:
     """Resolve channel entity and return basic info."""
-    async with TelegramClient("session_name", API_ID, API_HASH) as client:
-        try:
-            entity = await client.get_entity(channel_name)
-            return {"name": getattr(entity, "title", str(channel_name)), "id": entity.id, "entity": entity}
-        except Exception as e:
-            print(f"Error fetching channel info: {e}")
-            return None
+    meta_session_name = TG_SESSION_META or session_name
+    client = await get_client(meta_session_name)
+    try:
+        entity = await client.get_entity(channel_name)
+        _entities[(meta_session_name, channel_name)] = entity
+        return {"name": getattr(entity, "title", str(channel_name)), "id": entity.id, "entity": entity}
+    except Exception as e:
+        print(f"Error fetching channel info: {e}")
+        return None
 
 
 async def _get_latest_message_flag(client: TelegramClient, channel_entity: Any) -> Optional[MsgFlag]:
@@ -88,14 +187,45 @@ async def _get_latest_message_flag(client: TelegramClient, channel_entity: Any)
     return None
 
 
+def _is_iso(s: Any) -> bool:
+    try:
+        datetime.fromisoformat(s.replace("Z", "+00:00"))
+    except (AttributeError, TypeError, ValueError):
+        return False
+    return True
+
+
+def _load_cursor(state: Dict[str, Any], key: str, latest_id: Optional[int]) -> Optional[MsgFlag]:
+    """Read a cursor flag from state, dropping it (with a warning) if it is corrupt.
+
+    A bad id must not reach offset_id: 0 (or an id above the newest message) makes
+    Telegram start from the newest message and silently re-scan the whole archive.
+    """
+    raw = state.get(key)
+    try:
+        flag = dict_to_flag(raw)
+    except (KeyError, TypeError, ValueError):
+        flag = None
+    else:
+        if flag is None:
+            return None
+        if flag.id > 0 and (latest_id is None or flag.id <= latest_id) and _is_iso(flag.date):
+            return flag
+
+    print(f"[warn] invalid {key}, resetting: {raw!r}")
+    state[key] = None
+    return None
+
+
 async def collect_links_with_flags(
     channel_name: str,
     search_term: str,
     max_records: int = 10,
-    batch_size: int = 99,
+    batch_size: int = TG_BATCH_SIZE,
     reconnect_delay_sec: float = 2.0,
     session_name: str = "session_name",
-) -> List[CollectedRecord]:
+    meta_session_name: Optional[str] = TG_SESSION_META,
+) -> Collected:
     """Collect TinyGS telemetry links from a Telegram channel with persistent flags.
 
     Implements the 'start/middle/end flags' logic:
@@ -103,26 +233,50 @@ async def collect_links_with_flags(
     - middle_flag: cursor updated every batch_size messages (for safe reconnect/resume)
     - end_flag: last *collected* message (cursor for next manual run)
 
-    State is persisted in a JSON text file (STATE_DIR/flags_*.json).
+    State is persisted in the STATE_DB SQLite file, one row per channel+search pair
+    (an older STATE_DIR/flags_*.json is imported on first use).
+
+    Archive batches are read via `session_name`; channel lookup and the latest-message
+    probe go through `meta_session_name` (a separate connection; None = `session_name`).
     """
 
-    state_path = make_state_path(STATE_DIR, channel_name, search_term)
-    store = StateStore(state_path)
-    state = store.load()
+    store = SqliteStateStore(
+        STATE_DB,
+        channel_name,
+        search_term,
+        json_path=make_state_path(STATE_DIR, channel_name, search_term),
+    )
+    # closed on every exit: access errors and scan errors included
+    try:
+        state = store.load()
+
+        collected = Collected()
+        if state.get("status") == "in_progress":
+            # interrupted run: its records were saved together with the flags that skip them
+            for url, date, message_id in store.load_records():
+                collected.append(url, date, message_id)
+            if collected:
+                print(f"[resume] restored {len(collected)} records of the interrupted run")
+        else:
+            store.clear_records()
 
-    collected: List[CollectedRecord] = []
+        meta_session_name = meta_session_name or session_name
+        client = await get_client(session_name)
+        meta_client = await get_client(meta_session_name)
 
-    async with TelegramClient(session_name, API_ID, API_HASH) as client:
+        # each client gets the channel resolved by its own session (same object if one session)
         try:
-            channel_entity = await client.get_entity(channel_name)
+            meta_entity = await _resolve_channel(meta_session_name, channel_name)
+            channel_entity = await _resolve_channel(session_name, channel_name)
         except Exception as e:
             raise RuntimeError(f"Cannot access channel: {channel_name}: {e}")
 
-        latest_flag = await _get_latest_message_flag(client, channel_entity)
+        latest_flag = await _get_latest_message_flag(meta_client, meta_entity)
 
         # Determine starting cursor
-        prev_end = dict_to_flag(state.get("end_flag"))
-        prev_middle = dict_to_flag(state.get("middle_flag"))
+        latest_id = latest_flag.id if latest_flag is not None else None
+        prev_end = _load_cursor(state, "end_flag", latest_id)
+        prev_middle = _load_cursor(state, "middle_flag", latest_id)
 
         if state.get("status") == "in_progress" and prev_middle is not None:
             # Crash recovery: resume exactly from middle_flag to avoid gaps
@@ -155,6 +309,7 @@ async def collect_links_with_flags(
 
         # Helper for fetching a batch
         async def fetch_batch(start_cursor: Optional[MsgFlag]) -> List[Any]:
+            # one GetHistoryRequest per batch: Telethon splits limit > 100 into several calls
             kwargs: Dict[str, Any] = {"limit": batch_size}
             if start_cursor is not None:
                 # iter_messages returns messages with id < offset_id (older)
@@ -164,95 +319,131 @@ async def collect_links_with_flags(
                 msgs.append(msg)
             return msgs
 
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
+        # ids collected recently (persisted together with end_flag): a message that is already
+        # collected is skipped and counted, never returned twice, whichever cursor we resumed from
+        recent_ids: List[int] = list(state.get("recent_ids") or [])
+        seen = set(recent_ids)
+        duplicates = 0
+        username = _normalize_channel_username(channel_name)
+
         # Main loop: scan batches of up to batch_size messages
-        while len(collected) < max_records:
-            try:
-                messages = await fetch_batch(cursor)
-            except Exception as e:
-                # Network/session hiccup: wait and retry from the last persisted middle_flag
-                print(f"Telegram read error: {e}. Reconnecting from middle_flag...")
-                await asyncio.sleep(reconnect_delay_sec)
-                state = store.load()
-                cursor = dict_to_flag(state.get("middle_flag")) or cursor
-                continue
-
-            if not messages:
-                print("[batch] got=0 (no more messages), stopping.")
-                break
-
-            print(
-                f"[batch] got={len(messages)}  "
-                f"ids: {messages[0].id}->{messages[-1].id}  "
-                f"collected={len(collected)}/{max_records}"
-            )
-
-            # Process messages (newest -> oldest within the batch)
-            last_in_batch: Optional[MsgFlag] = None
-            for msg in messages:
-                last_in_batch = MsgFlag.from_message(msg)
-
-                text = msg.message or ""
-
-                # Debug helper (optional): shows what the channel actually contains
-                if "Polytech" in text:
-                    print("FOUND Polytech in msg", msg.id)
-                    print(text[:300])
-                    print("----")
-
-                if search_term in text:
-                    # Always return something useful:
-                    # - button URL if exists
-                    # - URL from text if exists
-                    # - otherwise a permalink to this channel message
-                    url = _extract_url(msg, channel_name)
-                    if not url:
+        next_task: Optional["asyncio.Task[List[Any]]"] = None
+        try:
+            while len(collected) < max_records:
+                if next_task is None:
+                    next_task = asyncio.create_task(fetch_batch(cursor))
+                try:
+                    messages = await next_task
+                except Exception as e:
+                    # Network/session hiccup: wait and retry from middle_flag
+                    # (already persisted: every batch is written to the state DB)
+                    next_task = None
+                    print(f"Telegram read error: {e}. Reconnecting from middle_flag...")
+                    await asyncio.sleep(reconnect_delay_sec)
+                    cursor = dict_to_flag(state.get("middle_flag")) or cursor
+                    continue
+                next_task = None
+
+                if not messages:
+                    print("[batch] got=0 (no more messages), stopping.")
+                    break
+
+                print(
+                    f"[batch] got={len(messages)}  "
+                    f"ids: {messages[0].id}->{messages[-1].id}  "
+                    f"collected={len(collected)}/{max_records}"
+                )
+
+                # Double buffering: the next (older) batch is fetched while this one is processed
+                next_task = asyncio.create_task(fetch_batch(MsgFlag.from_message(messages[-1])))
+
+                # Process messages (newest -> oldest within the batch).
+                # Flags are built once per batch, from the last scanned / last collected message.
+                last_msg: Any = None
+                batch_from = len(collected)
+                for msg in messages:
+                    last_msg = msg
+
+                    # stickers/photos/service messages: no text, nothing to match
+                    text = msg.message
+                    if not text:
                         continue
 
-                    rec = CollectedRecord(
-                        url=url,
-                        date=msg.date.isoformat(timespec="seconds"),
-                        message_id=int(msg.id),
-                    )
-                    collected.append(rec)
-
-                    # end_flag is always the last collected message (oldest collected so far)
-                    state["end_flag"] = flag_to_dict(MsgFlag.from_message(msg))
-
-                    if len(collected) >= max_records:
-                        break
-
-            # Update middle_flag for safe resume
-            if last_in_batch is not None:
-                cursor = last_in_batch
-                state["middle_flag"] = flag_to_dict(cursor)
-                store.save(state)
-
-            # Proactive disconnect/reconnect:
-            # Do it only if we likely hit the "batch_size limit" boundary.
-            # If Telegram returned < batch_size messages, we are near the end of history (or limited),
-            # and reconnecting just spams logs.
-            if len(messages) >= batch_size and len(collected) < max_records:
-                await client.disconnect()
-                await asyncio.sleep(reconnect_delay_sec)
-                await client.connect()
+                    # Debug helper (optional): shows what the channel actually contains
+                    if debug_enabled and "Polytech" in text:
+                        logger.debug("FOUND Polytech in msg %s\n%s\n----", msg.id, text[:300])
+
+                    if search_term in text:
+                        if msg.id in seen:
+                            duplicates += 1
+                            continue
+
+                        # Always return something useful:
+                        # - button URL if exists
+                        # - URL from text if exists
+                        # - otherwise a permalink to this channel message
+                        url = _extract_url(msg, username)
+                        if not url:
+                            continue
+
+                        collected.append(url, msg.date.isoformat(timespec="seconds"), int(msg.id))
+                        recent_ids.append(int(msg.id))
+                        seen.add(int(msg.id))
+
+                        if len(collected) >= max_records:
+                            break
+
+                # the batch's records, end_flag, recent_ids and middle_flag go into one commit:
+                # flags never point past a record that is not stored
+                records = list(zip(
+                    collected.urls[batch_from:], collected.dates[batch_from:], collected.ids[batch_from:]
+                ))
+
+                # end_flag is always the last collected message (oldest collected so far)
+                if records:
+                    state["end_flag"] = {"id": collected.ids[-1], "date": collected.dates[-1]}
+                    del recent_ids[:-RECENT_IDS_MAX]
+                    state["recent_ids"] = list(recent_ids)
+
+                # Update middle_flag for safe resume
+                if last_msg is not None:
+                    cursor = MsgFlag.from_message(last_msg)
+                    state["middle_flag"] = flag_to_dict(cursor)
+
+                store.save(state, records)
+        finally:
+            # stopped early (max_records / error): drop the prefetch, retrieving its result or error
+            if next_task is not None:
+                next_task.cancel()
+                await asyncio.gather(next_task, return_exceptions=True)
 
         # Finalize
         state["status"] = "idle"
         state["meta"]["finished_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
         state["meta"]["collected"] = int(len(collected))
+        state["meta"]["duplicates"] = int(duplicates)
         store.save(state)
 
-    return collected
+        return collected
+    finally:
+        store.close()
 
 
 # Backwards-compatible helper (kept for old main.py)
 async def collect_urls(channel_name: str, search_term: str, limit: int = 100) -> List[str]:
     """Legacy collector: returns only URLs from the latest N messages."""
     urls: List[str] = []
-    async with TelegramClient("session_name", API_ID, API_HASH) as client:
-        async for message in client.iter_messages(channel_name, limit=limit):
-            if message.message and search_term in message.message:
-                url = _extract_url(message, channel_name)
-                if url:
-                    urls.append(url)
+    append = urls.append
+    client = await get_client()
+    username = _normalize_channel_username(channel_name)
+    channel_entity = await _resolve_channel("session_name", channel_name)
+    async for message in client.iter_messages(channel_entity, limit=limit):
+        text = message.message
+        if not text or search_term not in text:
+            continue
+        url = _extract_url(message, username)
+        if url:
+            append(url)
     return urls
\ No newline at end of file
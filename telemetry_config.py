@@ -1,8 +1,9 @@
 # telemetry_config.py
 import os
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, List, Tuple
 
 from dotenv import load_dotenv
 
@@ -25,6 +26,7 @@ def _getenv(name: str, default=None, cast=None):
     return v
 
 
+@lru_cache(maxsize=256)
 def _norm_sat_env_key(sat: str) -> str:
     """
     Polytech_Universe-3 -> POLYTECH_UNIVERSE_3
@@ -36,6 +38,17 @@ def _norm_sat_env_key(sat: str) -> str:
         key = key.replace("__", "_")
     return key
 
+
+def _load_tle_map() -> Dict[str, Tuple[str, str]]:
+    """
+    TLE_<SAT>_1 / TLE_<SAT>_2 from env -> {SAT: (tle1, tle2)}, one pass over os.environ
+    """
+    tles: Dict[str, List[str]] = {}
+    for name, value in os.environ.items():
+        if name.startswith("TLE_") and name[-2:] in ("_1", "_2"):
+            tles.setdefault(name[4:-2], ["", ""])[int(name[-1]) - 1] = value.strip()
+    return {sat: (tle1, tle2) for sat, (tle1, tle2) in tles.items()}
+
 # ----------------------------
 # OLD SETTINGS (keep)
 # ----------------------------
@@ -45,6 +58,8 @@ API_HASH = _getenv("TG_API_HASH", "de070de393ff80313763716357177c1c")
 URLS_FILE = _getenv("URLS_FILE", str(PROJECT_ROOT / "data" / "urls.csv"))
 PROCESSED_DIR = _getenv("PROCESSED_DIR", str(PROJECT_ROOT / "processed_data"))
 STATE_DIR = _getenv("STATE_DIR", str(PROJECT_ROOT / "data" / "state"))
+# SQLite file with the start/middle/end flags of all channel+search pairs (state_sqlite.py)
+STATE_DB = _getenv("STATE_DB", os.path.join(STATE_DIR, "flags.sqlite3"))
 
 REQUEST_DELAY = (
     float(_getenv("REQUEST_DELAY_MIN", 1)),
@@ -66,6 +81,8 @@ HEADERS = {
 # ----------------------------
 TG_CHANNEL = _getenv("TG_CHANNEL", "t.me/tinyGS_Telemetry")
 DATABASE_URL = _getenv("DATABASE_URL", f"sqlite:///{PROJECT_ROOT / 'telemetry.db'}")
+DB_POOL_SIZE = _getenv("DB_POOL_SIZE", 10, int)
+DB_MAX_OVERFLOW = _getenv("DB_MAX_OVERFLOW", 20, int)
 CORS_ALLOW_ORIGINS = _getenv("CORS_ALLOW_ORIGINS", "http://localhost:5173")
 
 DEFAULT_SATELLITE = _getenv("DEFAULT_SATELLITE", "Polytech_Universe-3")
@@ -73,9 +90,20 @@ DEFAULT_DAYS = _getenv("DEFAULT_DAYS", 30, int)
 
 TELETHON_SESSION_NAME = _getenv("TELETHON_SESSION_NAME", str(PROJECT_ROOT / "user_session"))
 
+# telegram_handler: отдельная сессия (и MTProto-соединение) для метаданных — get_entity,
+# последнее сообщение, — чтобы длинное чтение архива их не задерживало.
+# Не задана — используется сессия чтения (один клиент): новый файл сессии потребовал бы
+# интерактивного входа по телефону/коду.
+TG_SESSION_META = _getenv("TG_SESSION_META") or None
+# сообщений в одном запросе истории; 100 — максимум, который Telegram отдаёт за раз
+TG_BATCH_SIZE = _getenv("TG_BATCH_SIZE", 100, int)
+
 # ✅ ВАЖНО: объявляем ДО settings = Settings(...)
 COLLECT_TOKEN = _getenv("COLLECT_TOKEN", "")
 
+# TLE читаются из env один раз, при импорте (после load_dotenv)
+_TLE_MAP = _load_tle_map()
+
 # ----------------------------
 # Settings object
 # ----------------------------
@@ -87,6 +115,8 @@ class Settings:
     telethon_session_name: str
 
     database_url: str
+    db_pool_size: int
+    db_max_overflow: int
     cors_allow_origins: str
 
     default_satellite: str
@@ -102,10 +132,7 @@ class Settings:
 
         SAT is normalized: Polytech_Universe-3 -> POLYTECH_UNIVERSE_3
         """
-        k = _norm_sat_env_key(sat)
-        tle1 = os.getenv(f"TLE_{k}_1", "").strip()
-        tle2 = os.getenv(f"TLE_{k}_2", "").strip()
-        return tle1, tle2
+        return _TLE_MAP.get(_norm_sat_env_key(sat), ("", ""))
 
 
 settings = Settings(
@@ -115,6 +142,8 @@ settings = Settings(
     telethon_session_name=str(TELETHON_SESSION_NAME),
 
     database_url=str(DATABASE_URL),
+    db_pool_size=int(DB_POOL_SIZE),
+    db_max_overflow=int(DB_MAX_OVERFLOW),
     cors_allow_origins=str(CORS_ALLOW_ORIGINS),
 
     default_satellite=str(DEFAULT_SATELLITE),
@@ -1,9 +1,8 @@
 from telethon import TelegramClient
 import asyncio
-import time
 import os
 import re
-import json
+import orjson
 from datetime import datetime
 from telemetry_config import API_ID, API_HASH
 
@@ -38,7 +37,8 @@ def load_existing_links(output_file):
     """
     if os.path.exists(output_file):
         with open(output_file, "r") as file:
-            return {line.strip().split(" ")[0] for line in file.readlines()}
+            # построчно, без readlines(); partition не строит список всех частей строки
+            return {line.strip().partition(" ")[0] for line in file}
     return set()
 
 def save_links_to_file(links, output_file):
@@ -65,16 +65,20 @@ def convert_txt_to_json(txt_file, json_file):
         txt_file (str): Имя текстового файла.
         json_file (str): Имя JSON-файла.
     """
-    data = []
     if os.path.exists(txt_file):
-        with open(txt_file, "r") as file:
+        # пишем JSON-массив потоково, по записи, без списка всех записей в памяти;
+        # разметка та же, что у orjson.dumps(list, OPT_INDENT_2)
+        with open(txt_file, "r") as file, open(json_file, "wb") as json_out:
+            first = True
             for line in file:
-                parts = line.strip().split(" ")
-                if len(parts) >= 2:
-                    data.append({"url": parts[0], "date": " ".join(parts[1:])})
-
-        with open(json_file, "w", encoding="utf-8") as json_out:
-            json.dump(data, json_out, ensure_ascii=False, indent=4)
+                url, sep, date = line.strip().partition(" ")
+                if not sep:
+                    continue
+                item = orjson.dumps({"url": url, "date": date}, option=orjson.OPT_INDENT_2)
+                json_out.write(b"[\n  " if first else b",\n  ")
+                json_out.write(item.replace(b"\n", b"\n  "))
+                first = False
+            json_out.write(b"[]" if first else b"\n]")
         print(f"Данные успешно сохранены в {json_file}.")
 
 async def collect_links_from_archive(channel_entity, search_term, output_file, delay, max_records):
@@ -100,27 +104,29 @@ async def collect_links_from_archive(channel_entity, search_term, output_file, d
             message_count += 1
             print(f"Обработка сообщения из канала: {message_count}")
             # Проверяем, содержит ли сообщение нужный текст
-            if search_term in (message.message or ""):
-                # print(f"Сообщение ID {message.id} содержит '{search_term}'.")
-                # Проверяем наличие кнопок
-                if message.buttons:
-                    try:
-                        # Извлекаем URL из первой кнопки
-                        url = message.buttons[0][0].url
-                        message_date = message.date.strftime("%Y-%m-%d %H:%M")
-                        if url not in existing_links:
-                            collected_links.append((url, message_date))
-                            print(f"Новая ссылка: {url}, дата: {message_date}")
-                    except (IndexError, AttributeError):
-                        print(f"Ошибка обработки кнопки в сообщении ID {message.id}")
-            # Проверяем лимит на количество ссылок
+            # (чужие сообщения пропускаем без задержки)
+            if search_term not in (message.message or ""):
+                continue
+
+            # print(f"Сообщение ID {message.id} содержит '{search_term}'.")
+            # Проверяем наличие кнопок
+            if message.buttons:
+                try:
+                    # Извлекаем URL из первой кнопки
+                    url = message.buttons[0][0].url
+                    message_date = message.date.strftime("%Y-%m-%d %H:%M")
+                    if url not in existing_links:
+                        collected_links.append((url, message_date))
+                        print(f"Новая ссылка: {url}, дата: {message_date}")
+                except (IndexError, AttributeError):
+                    print(f"Ошибка обработки кнопки в сообщении ID {message.id}")
             # Проверяем лимит на количество ссылок
             if len(collected_links) >= max_records:
                 print(f"Достигнут лимит в {max_records} ссылок.")
                 break
 
-            # Задержка между запросами
-            time.sleep(delay)
+            # Задержка между запросами (asyncio.sleep: time.sleep останавливал весь event loop)
+            await asyncio.sleep(delay)
         
         # Сохраняем ссылки
         all_links = list(existing_links) + collected_links
@@ -158,7 +164,11 @@ async def collect_links_in_time_range(channel_entity, search_term, output_file,
             process_flag = message_date
             print(f"Обновлен process_flag: {process_flag}")
 
-            if search_term in (message.message or "") and message.buttons:
+            # чужие сообщения пропускаем без задержки
+            if search_term not in (message.message or ""):
+                continue
+
+            if message.buttons:
                 try:
                     url = message.buttons[0][0].url
                     if url not in existing_links:
@@ -180,8 +190,8 @@ async def collect_links_in_time_range(channel_entity, search_term, output_file,
                 return process_flag, collected_links
             
             
-         # Задержка между запросами
-            time.sleep(delay)
+            # Задержка между запросами (asyncio.sleep: time.sleep останавливал весь event loop)
+            await asyncio.sleep(delay)
 
         save_links_to_file(collected_links, output_file)
         convert_txt_to_json(output_file, json_file)